@@ -1,15 +1,186 @@
+import hashlib
+import os
+from itertools import chain
+
+# orjson encodes JSON in C, much faster than the stdlib json module used by jsonify
+import orjson
+
 # Import necessary modules from Flask for creating the web application
-from flask import Flask, jsonify, request, abort
+from flask import Flask, Response, request, abort
+from flask_compress import Compress
 
 # Import the FlightData class from the 'data' module, which handles database operations
 from data import FlightData
 
+# Mimetype of newline-delimited JSON, one JSON object per line
+NDJSON_MIMETYPE = "application/x-ndjson"
+
 # Initialize the Flask application
 app = Flask(__name__)
 
+# Compress the JSON responses, whose repeated keys and values compress very well.
+# Streamed responses are compressed chunk by chunk, which gzip does not support.
+app.config["COMPRESS_MIMETYPES"] = ["application/json", NDJSON_MIMETYPE]
+app.config["COMPRESS_ALGORITHM"] = ["br", "zstd", "gzip"]
+app.config["COMPRESS_ALGORITHM_STREAMING"] = ["zstd", "br"]
+Compress(app)
+
+# Number of threads serving requests concurrently
+SERVER_THREADS = 16
+
+# Path of the SQLite database file. Replace it with the actual path to your database file.
+DB_PATH = 'data/flights.sqlite3'
+
 # Create an instance of the FlightData class, providing the database URI as an argument.
-# Replace 'sqlite:///data/flights.sqlite3' with the actual path to your SQLite database file.
-flight_data = FlightData('sqlite:///data/flights.sqlite3')
+# Every server thread can hold its own pooled connection while its query runs.
+flight_data = FlightData(f'sqlite:///{DB_PATH}', pool_size=SERVER_THREADS)
+
+# Seconds clients may reuse a cached aggregate response before revalidating it
+CACHE_MAX_AGE = 3600
+
+# Maximum number of flights that can be requested at once by ID
+MAX_FLIGHT_IDS = 1000
+
+
+def json_response(obj):
+    """
+    Serialize an object into a JSON response using orjson.
+
+    Args:
+        obj (Any): The object to serialize.
+
+    Returns:
+        Response: The JSON response.
+    """
+    # Query results are row mappings rather than dicts, so convert them on the fly
+    body = orjson.dumps(obj, default=dict, option=orjson.OPT_SERIALIZE_NUMPY)
+    return app.response_class(body, mimetype="application/json")
+
+
+# ETag of the database version the data held by flight_data was loaded from
+loaded_etag = None
+
+
+def database_etag():
+    """
+    Compute an ETag identifying the current version of the database, derived from
+    the modification time of the database file. It changes whenever the data is
+    re-ingested or migrated.
+
+    When it changes, flight_data drops its cached results, so the new ETag is never
+    sent along with data loaded from the previous version.
+
+    Returns:
+        str: The ETag.
+    """
+    global loaded_etag
+    mtime = os.path.getmtime(DB_PATH)
+    etag = hashlib.blake2b(repr(mtime).encode(), digest_size=8).hexdigest()
+    if etag != loaded_etag:
+        if loaded_etag is not None:
+            flight_data.reload()
+        loaded_etag = etag
+    return etag
+
+
+def conditional_json_response(load):
+    """
+    Build a JSON response that clients may cache until the database changes.
+
+    If the client already holds the current version, a 304 Not Modified response
+    is returned without loading or encoding the data.
+
+    Args:
+        load (Callable[[], Any]): Loads the data to serialize, returning None if that failed.
+
+    Returns:
+        Response: The JSON response, or an empty 304 response.
+    """
+    etag = database_etag()
+    # Flask-Compress appends the content encoding to the ETag of compressed responses
+    client_etags = {tag.split(":", 1)[0] for tag in request.if_none_match.as_set()}
+    if request.if_none_match.star_tag or etag in client_etags:
+        response = app.response_class(status=304)
+    else:
+        data = load()
+        if data is None:
+            abort(500, description="Failed to load the data")  # Return a 500 error rather than caching a failure
+        response = json_response(data)
+    response.set_etag(etag)
+    response.cache_control.max_age = CACHE_MAX_AGE
+    return response
+
+
+def stream_json_array(rows):
+    """
+    Serialize rows into a JSON array piece by piece.
+
+    Args:
+        rows (Iterable[Dict[str, Any]]): The rows to serialize.
+
+    Yields:
+        bytes: Chunks of the JSON array, one row at a time.
+    """
+    yield b"["
+    for index, row in enumerate(rows):
+        if index:
+            yield b","
+        yield orjson.dumps(row)
+    yield b"]"
+
+
+def stream_ndjson(rows):
+    """
+    Serialize rows into newline-delimited JSON, one line per row.
+
+    Args:
+        rows (Iterable[Dict[str, Any]]): The rows to serialize.
+
+    Yields:
+        bytes: One JSON line per row.
+    """
+    for row in rows:
+        yield orjson.dumps(row, default=dict) + b"\n"
+
+
+def wants_ndjson():
+    """
+    Check whether the client asked for newline-delimited JSON, either with the
+    'format=ndjson' query parameter or through its Accept header.
+
+    Returns:
+        bool: True if the response should be NDJSON.
+    """
+    if request.args.get('format') == 'ndjson':
+        return True
+    return request.accept_mimetypes.best_match(["application/json", NDJSON_MIMETYPE]) == NDJSON_MIMETYPE
+
+
+def stream_rows(rows, empty_message):
+    """
+    Build a streamed JSON or NDJSON response from a row iterator.
+
+    The first row is fetched up front so that an empty JSON result can still be
+    answered with a message instead of an empty array, and a query failing before
+    any row is sent is answered with a 500 error. A failure after that aborts the
+    streamed response. An empty NDJSON response simply has no lines.
+
+    Args:
+        rows (Iterator[Dict[str, Any]]): The rows to stream.
+        empty_message (str): The message returned when there are no rows.
+
+    Returns:
+        Response: A streamed JSON array or NDJSON, or a JSON message if there are no rows.
+    """
+    try:
+        first = next(rows, None)
+    except Exception:
+        abort(500, description="Failed to load the data")  # Return a 500 error if the query failed
+    if wants_ndjson():
+        return Response(stream_ndjson(rows if first is None else chain([first], rows)), mimetype=NDJSON_MIMETYPE)
+    if first is None:  # If no rows are found
+        return json_response({"message": empty_message}), 200  # Return a success message
+    return Response(stream_json_array(chain([first], rows)), mimetype="application/json")
 
 
 # Define an endpoint to retrieve flight information by ID
@@ -28,7 +199,37 @@ def get_flight_by_id(flight_id):
     flight = flight_data.get_flight_by_id(flight_id)  # Fetch the flight using the FlightData method
     if not flight:  # If no flight is found with the given ID
         abort(404, description="Flight not found")  # Return a 404 error
-    return jsonify(flight)  # Return the flight details as JSON
+    return json_response(flight)  # Return the flight details as JSON
+
+
+# Define an endpoint to retrieve several flights by ID at once
+@app.route('/flights', methods=['GET'])
+def get_flights_by_ids():
+    """
+    This endpoint retrieves several flights by their IDs with a single query.
+
+    Query Parameters:
+        ids (str): Comma-separated flight IDs, e.g. '1,2,3'.
+        format (str, optional): 'ndjson' to return one JSON object per line.
+
+    Returns:
+        JSON response: If flights are found, it returns them in JSON format, ordered by ID.
+                       If no flights are found, it returns a message indicating so.
+                       If the IDs are missing or invalid, it returns a 400 error.
+    """
+    try:
+        flight_ids = [int(flight_id) for flight_id in request.args.get('ids', '').split(',') if flight_id.strip()]
+    except ValueError:
+        abort(400, description="Parameter 'ids' must be a comma-separated list of integers")
+
+    # Ensure a reasonable number of IDs is provided
+    if not flight_ids:
+        abort(400, description="Parameter 'ids' is required")
+    if len(flight_ids) > MAX_FLIGHT_IDS:
+        abort(400, description=f"At most {MAX_FLIGHT_IDS} flight IDs can be requested at once")
+
+    flights = flight_data.iter_flights_by_ids(flight_ids)  # Stream the requested flights
+    return stream_rows(flights, "No flights found for these IDs")  # Stream the flights as JSON
 
 
 # Define an endpoint to retrieve delayed flights for a specific airline
@@ -40,14 +241,15 @@ def get_delayed_flights_by_airline(airline):
     Args:
         airline (str): The name of the airline.
 
+    Query Parameters:
+        format (str, optional): 'ndjson' to return one JSON object per line.
+
     Returns:
         JSON response: If delayed flights are found, it returns them in JSON format.
                        If no delayed flights are found, it returns a message indicating so.
     """
-    flights = flight_data.get_delayed_flights_by_airline(airline)  # Fetch delayed flights for the airline
-    if not flights:  # If no delayed flights are found
-        return jsonify({"message": "No delayed flights found for this airline"}), 200  # Return a success message
-    return jsonify(flights)  # Return the list of delayed flights as JSON
+    flights = flight_data.iter_delayed_flights_by_airline(airline)  # Stream delayed flights for the airline
+    return stream_rows(flights, "No delayed flights found for this airline")  # Stream the delayed flights as JSON
 
 
 # Define an endpoint to retrieve delayed flights for a specific origin airport
@@ -59,14 +261,15 @@ def get_delayed_flights_by_airport(airport):
     Args:
         airport (str): The IATA code of the origin airport.
 
+    Query Parameters:
+        format (str, optional): 'ndjson' to return one JSON object per line.
+
     Returns:
         JSON response: If delayed flights are found, it returns them in JSON format.
                        If no delayed flights are found, it returns a message indicating so.
     """
-    flights = flight_data.get_delayed_flights_by_airport(airport)  # Fetch delayed flights for the airport
-    if not flights:  # If no delayed flights are found
-        return jsonify({"message": "No delayed flights found for this airport"}), 200  # Return a success message
-    return jsonify(flights)  # Return the list of delayed flights as JSON
+    flights = flight_data.iter_delayed_flights_by_airport(airport)  # Stream delayed flights for the airport
+    return stream_rows(flights, "No delayed flights found for this airport")  # Stream the delayed flights as JSON
 
 
 # Define an endpoint to retrieve all flights for a specific date
@@ -79,6 +282,7 @@ def get_flights_by_date():
         day (int): The day of the flight.
         month (int): The month of the flight.
         year (int): The year of the flight.
+        format (str, optional): 'ndjson' to return one JSON object per line.
 
     Returns:
         JSON response: If flights are found, it returns them in JSON format.
@@ -94,10 +298,8 @@ def get_flights_by_date():
         abort(400,
               description="Parameters 'day', 'month', and 'year' are required")  # Return a 400 error if any are missing
 
-    flights = flight_data.get_flights_by_date(day, month, year)  # Fetch flights for the specified date
-    if not flights:  # If no flights are found
-        return jsonify({"message": "No flights found for this date"}), 200  # Return a success message
-    return jsonify(flights)  # Return the list of flights as JSON
+    flights = flight_data.iter_flights_by_date(day, month, year)  # Stream flights for the specified date
+    return stream_rows(flights, "No flights found for this date")  # Stream the flights as JSON
 
 
 # Define an endpoint to retrieve the percentage of delayed flights by airline
@@ -107,10 +309,11 @@ def get_delayed_flights_percentage_by_airline():
     This endpoint retrieves the percentage of delayed flights for each airline.
 
     Returns:
-        JSON response: A list of airlines with their respective delay percentages.
+        JSON response: The column names and a row per airline with its delay percentage.
+                       If the client's cached copy is current, it returns 304 Not Modified.
     """
-    result = flight_data.get_delayed_flights_percentage_by_airline()  # Fetch delay percentages by airline
-    return jsonify(result)  # Return the results as JSON
+    # Fetch delay percentages by airline and return them as JSON, unless the client's copy is current
+    return conditional_json_response(flight_data.get_delayed_flights_percentage_by_airline)
 
 
 # Define an endpoint to retrieve the percentage of delayed flights by hour interval
@@ -120,10 +323,11 @@ def get_delayed_flights_percentage_by_hour():
     This endpoint retrieves the percentage of delayed flights for each hour interval.
 
     Returns:
-        JSON response: A list of hourly intervals with their respective delay percentages.
+        JSON response: The column names and a row per hourly interval with its delay percentage.
+                       If the client's cached copy is current, it returns 304 Not Modified.
     """
-    result = flight_data.get_delayed_flights_percentage_by_hour()  # Fetch delay percentages by hour
-    return jsonify(result)  # Return the results as JSON
+    # Fetch delay percentages by hour and return them as JSON, unless the client's copy is current
+    return conditional_json_response(flight_data.get_delayed_flights_percentage_by_hour)
 
 
 # Define an endpoint to retrieve the percentage of delayed flights by route
@@ -132,11 +336,24 @@ def get_delayed_flights_percentage_by_route():
     """
     This endpoint retrieves the percentage of delayed flights for each route.
 
+    Query Parameters:
+        format (str, optional): 'ndjson' to return one JSON object per route and line instead.
+
     Returns:
-        JSON response: A list of routes with their respective delay percentages.
+        JSON response: The column names and a row per route with its delay percentage.
+                       If the client's cached copy is current, it returns 304 Not Modified.
     """
-    result = flight_data.get_delayed_flights_percentage_by_route()  # Fetch delay percentages by route
-    return jsonify(result)  # Return the results as JSON
+    if wants_ndjson():  # Return one route per line if NDJSON was requested
+        result = flight_data.get_delayed_flights_percentage_by_route()  # Fetch delay percentages by route
+        if result is None:
+            abort(500, description="Failed to load the data")  # Return a 500 error if the query failed
+        routes = (dict(zip(result["columns"], row)) for row in result["rows"])
+        response = Response(stream_ndjson(routes), mimetype=NDJSON_MIMETYPE)
+    else:
+        # Fetch delay percentages by route and return them as JSON, unless the client's copy is current
+        response = conditional_json_response(flight_data.get_delayed_flights_percentage_by_route)
+    response.vary.add('Accept')  # The format depends on the Accept header, so caches must key on it
+    return response
 
 
 # Define an endpoint to retrieve airport coordinates
@@ -147,11 +364,15 @@ def get_airport_coordinates():
 
     Returns:
         JSON response: A list of airports with their coordinates.
+                       If the client's cached copy is current, it returns 304 Not Modified.
     """
-    result = flight_data.get_airport_coordinates()  # Fetch airport coordinates
-    return jsonify(result)  # Return the results as JSON
+    # Fetch airport coordinates and return them as JSON, unless the client's copy is current
+    return conditional_json_response(flight_data.get_airport_coordinates)
 
 
-# Run the Flask application if this script is executed directly
+# Serve the application with the waitress WSGI server if this script is executed directly.
+# Requests are handled by a pool of threads instead of Flask's single-threaded debug server.
 if __name__ == '__main__':
-    app.run(host='0.0.0.0', port=5001, debug=True)  # Start the Flask server on host '0.0.0.0' and port 5001
\ No newline at end of file
+    from waitress import serve
+
+    serve(app, host='0.0.0.0', port=5001, threads=SERVER_THREADS)  # Start the server on host '0.0.0.0' and port 5001
@@ -1,7 +1,11 @@
-from sqlalchemy import create_engine, text
+from sqlalchemy import bindparam, create_engine, event, inspect, text
+from sqlalchemy.engine import make_url
+from sqlalchemy.sql.elements import TextClause
 from contextlib import contextmanager
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Callable, Iterator, Optional, Sequence, Tuple
 import logging
+import time
+import numpy as np
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
@@ -13,113 +17,311 @@ class FlightData:
 
     Attributes:
         QUERIES (Dict[str, str]): Dictionary of SQL queries used in the class.
+        STREAM_BATCH_SIZE (int): Number of rows fetched per round-trip when streaming results.
+        CACHE_TTL (float): Seconds the cached aggregate results stay fresh.
+        SQLITE_PRAGMAS (Dict[str, Any]): Pragmas applied to every new SQLite connection.
+        PAGE_SIZE (int): Page size in bytes the SQLite database is rebuilt with.
+        INDEXES (Dict[str, str]): Indexes created by `create_indexes`, keyed by name.
+        SUMMARIES (Dict[str, str]): Queries materialized into summary tables, keyed by table name.
+        _FLIGHT_DETAILS (str): Flight detail projection the lookups by ID in QUERIES are built on.
         _engine: SQLAlchemy engine for database connection.
+        _cache (Dict[str, Tuple[Optional[float], Any]]): Cached results keyed by name,
+            with their expiry time (None if they never expire).
+        _stmts (Dict[str, TextClause]): QUERIES with the summary table placeholders resolved,
+            built once into reusable statements.
     """
 
-    # Centralized SQL Queries
-    QUERIES = {
-        "flight_by_id": """
+    STREAM_BATCH_SIZE = 1000
+    CACHE_TTL = 300
+
+    # Keep the hot pages of the repeated full-table scans in memory. Memory-mapping
+    # the whole database file serves page reads without a syscall per page.
+    SQLITE_PRAGMAS = {
+        "cache_size": -131072,  # 128 MB page cache
+        "mmap_size": 1073741824,  # 1 GB of memory-mapped I/O
+        "temp_store": "MEMORY",
+    }
+
+    # Page size the database is rebuilt with by `rebuild_pages`; larger pages mean
+    # fewer page reads and better read-ahead during full scans
+    PAGE_SIZE = 8192
+
+    # Indexes backing the delay and date filters. Equality columns lead so the
+    # DEPARTURE_DELAY > 0 condition can still be answered with a range scan.
+    INDEXES = {
+        "idx_flights_airline_delay": "flights(AIRLINE, DEPARTURE_DELAY)",
+        "idx_flights_origin_delay": "flights(ORIGIN_AIRPORT, DEPARTURE_DELAY)",
+        "idx_flights_date": "flights(YEAR, MONTH, DAY)",
+        # Expression index matching the delayed_by_hour grouping, so the aggregate is a
+        # covering scan in hour order instead of a table scan plus temp B-tree sort
+        "idx_flights_hour_delay": "flights(substr(SCHEDULED_DEPARTURE, 1, 2), DEPARTURE_DELAY)",
+    }
+
+    # Precomputed delay aggregates, materialized by `refresh_summaries`. The
+    # delayed_by_* queries read from these tables via {table} placeholders.
+    # Percentages are rounded to hundredths with integer arithmetic, so the only
+    # floating point step is the final division by 100.
+    SUMMARIES = {
+        "flight_stats_by_airline": """
             SELECT 
-                flights.*, 
+                airlines.airline AS Airline,
+                COUNT(*) AS TotalFlights,
+                SUM(CASE WHEN flights.DEPARTURE_DELAY > 0 THEN 1 ELSE 0 END) AS DelayedFlights,
+                (SUM(CASE WHEN flights.DEPARTURE_DELAY > 0 THEN 1 ELSE 0 END) * 10000 + COUNT(*) / 2)
+                    / COUNT(*) / 100.0 AS Percentage_Delayed
+            FROM flights
+            JOIN airlines ON flights.AIRLINE = airlines.id
+            GROUP BY airlines.airline
+        """,
+        "flight_stats_by_hour": """
+            SELECT 
+                substr(SCHEDULED_DEPARTURE, 1, 2) AS ScheduledHour,
+                COUNT(*) AS TotalFlights,
+                SUM(CASE WHEN DEPARTURE_DELAY > 0 THEN 1 ELSE 0 END) AS DelayedFlights,
+                (SUM(CASE WHEN DEPARTURE_DELAY > 0 THEN 1 ELSE 0 END) * 10000 + COUNT(*) / 2)
+                    / COUNT(*) / 100.0 AS Percentage_Delayed
+            FROM flights
+            GROUP BY ScheduledHour
+        """,
+        "flight_stats_by_route": """
+            SELECT 
+                ORIGIN_AIRPORT,
+                DESTINATION_AIRPORT,
+                COUNT(*) AS TotalFlights,
+                SUM(CASE WHEN DEPARTURE_DELAY > 0 THEN 1 ELSE 0 END) AS DelayedFlights,
+                (SUM(CASE WHEN DEPARTURE_DELAY > 0 THEN 1 ELSE 0 END) * 10000 + COUNT(*) / 2)
+                    / COUNT(*) / 100.0 AS Percentage_Delayed
+            FROM flights
+            GROUP BY ORIGIN_AIRPORT, DESTINATION_AIRPORT
+        """,
+    }
+
+    # Full details of a flight, shared by the lookups by ID
+    _FLIGHT_DETAILS = """
+            SELECT 
+                flights.ID,
+                flights.YEAR,
+                flights.MONTH,
+                flights.DAY,
+                flights.DAY_OF_WEEK,
+                flights.AIRLINE,
+                flights.FLIGHT_NUMBER,
+                flights.TAIL_NUMBER,
+                flights.ORIGIN_AIRPORT,
+                flights.DESTINATION_AIRPORT,
+                flights.SCHEDULED_DEPARTURE,
+                flights.DEPARTURE_TIME,
+                COALESCE(flights.DEPARTURE_DELAY, 0) AS DEPARTURE_DELAY,
+                flights.TAXI_OUT,
+                flights.WHEELS_OFF,
+                flights.SCHEDULED_TIME,
+                flights.ELAPSED_TIME,
+                flights.AIR_TIME,
+                flights.DISTANCE,
+                flights.WHEELS_ON,
+                flights.TAXI_IN,
+                flights.SCHEDULED_ARRIVAL,
+                flights.ARRIVAL_TIME,
+                flights.ARRIVAL_DELAY,
+                flights.DIVERTED,
+                flights.CANCELLED,
+                flights.CANCELLATION_REASON,
+                flights.AIR_SYSTEM_DELAY,
+                flights.SECURITY_DELAY,
+                flights.AIRLINE_DELAY,
+                flights.LATE_AIRCRAFT_DELAY,
+                flights.WEATHER_DELAY,
                 airlines.airline AS Airline, 
                 flights.ID AS FLIGHT_ID, 
                 flights.DEPARTURE_DELAY AS DELAY
             FROM flights 
-            JOIN airlines ON flights.AIRLINE = airlines.id 
+            JOIN airlines ON flights.AIRLINE = airlines.id
+    """
+
+    # Centralized SQL Queries
+    QUERIES = {
+        "flight_by_id": _FLIGHT_DETAILS + """
             WHERE flights.ID = :id;
         """,
+        "flights_by_ids": _FLIGHT_DETAILS + """
+            WHERE flights.ID IN :ids
+            ORDER BY flights.ID;
+        """,
         "delayed_flights_by_airline": """
             SELECT 
-                flights.*,
+                flights.ID,
+                flights.YEAR,
+                flights.MONTH,
+                flights.DAY,
+                flights.AIRLINE,
+                flights.FLIGHT_NUMBER,
+                flights.ORIGIN_AIRPORT,
+                flights.DESTINATION_AIRPORT,
+                flights.SCHEDULED_DEPARTURE,
+                COALESCE(flights.DEPARTURE_DELAY, 0) AS DEPARTURE_DELAY,
+                flights.ARRIVAL_DELAY,
                 airlines.airline AS Airline,
                 flights.DEPARTURE_DELAY AS DELAY
             FROM flights
             JOIN airlines ON flights.AIRLINE = airlines.id
-            WHERE airlines.airline = :airline AND flights.DEPARTURE_DELAY > 0;
+            WHERE airlines.airline = :airline AND flights.DEPARTURE_DELAY > 0
+            ORDER BY flights.ID;
         """,
         "delayed_flights_by_airport": """
             SELECT 
-                flights.*,
+                flights.ID,
+                flights.YEAR,
+                flights.MONTH,
+                flights.DAY,
+                flights.AIRLINE,
+                flights.FLIGHT_NUMBER,
+                flights.ORIGIN_AIRPORT,
+                flights.DESTINATION_AIRPORT,
+                flights.SCHEDULED_DEPARTURE,
+                COALESCE(flights.DEPARTURE_DELAY, 0) AS DEPARTURE_DELAY,
+                flights.ARRIVAL_DELAY,
                 airlines.airline AS Airline,
                 flights.DEPARTURE_DELAY AS DELAY
             FROM flights
             JOIN airlines ON flights.AIRLINE = airlines.id
-            WHERE flights.ORIGIN_AIRPORT = :airport AND flights.DEPARTURE_DELAY > 0;
+            WHERE flights.ORIGIN_AIRPORT = :airport AND flights.DEPARTURE_DELAY > 0
+            ORDER BY flights.ID;
         """,
         "flights_by_date": """
             SELECT 
-                flights.*,
+                flights.ID,
+                flights.YEAR,
+                flights.MONTH,
+                flights.DAY,
+                flights.AIRLINE,
+                flights.FLIGHT_NUMBER,
+                flights.ORIGIN_AIRPORT,
+                flights.DESTINATION_AIRPORT,
+                flights.SCHEDULED_DEPARTURE,
+                COALESCE(flights.DEPARTURE_DELAY, 0) AS DEPARTURE_DELAY,
+                flights.ARRIVAL_DELAY,
                 airlines.airline AS Airline,
                 flights.DEPARTURE_DELAY AS DELAY
             FROM flights
             JOIN airlines ON flights.AIRLINE = airlines.id
-            WHERE flights.DAY = :day AND flights.MONTH = :month AND flights.YEAR = :year;
+            WHERE flights.DAY = :day AND flights.MONTH = :month AND flights.YEAR = :year
+            ORDER BY flights.ID;
         """,
         "delayed_by_airline": """
-            WITH flight_stats AS (
-                SELECT 
-                    airlines.airline AS Airline,
-                    COUNT(*) AS total_flights,
-                    SUM(CASE WHEN flights.DEPARTURE_DELAY > 0 THEN 1 ELSE 0 END) AS delayed_flights
-                FROM flights
-                JOIN airlines ON flights.AIRLINE = airlines.id
-                GROUP BY airlines.airline
-            )
-            SELECT 
-                Airline,
-                ROUND((CAST(delayed_flights AS FLOAT) * 100 / total_flights), 2) AS Percentage_Delayed
-            FROM flight_stats
-            ORDER BY Percentage_Delayed DESC;
+            SELECT Airline, Percentage_Delayed
+            FROM {flight_stats_by_airline}
+            ORDER BY Percentage_Delayed ASC;
         """,
         "delayed_by_hour": """
-            SELECT 
-                substr(SCHEDULED_DEPARTURE, 1, 2) AS ScheduledHour,
-                COUNT(*) AS TotalFlights,
-                SUM(CASE WHEN DEPARTURE_DELAY > 0 THEN 1 ELSE 0 END) AS DelayedFlights,
-                ROUND(
-                    (SUM(CASE WHEN DEPARTURE_DELAY > 0 THEN 1 ELSE 0 END) * 100.0 / COUNT(*)), 
-                    2
-                ) AS Percentage_Delayed
-            FROM flights
-            GROUP BY ScheduledHour
+            SELECT ScheduledHour, TotalFlights, DelayedFlights, Percentage_Delayed
+            FROM {flight_stats_by_hour}
             ORDER BY ScheduledHour;
         """,
         "delayed_by_route": """
-            SELECT 
-                ORIGIN_AIRPORT,
-                DESTINATION_AIRPORT,
-                COUNT(*) AS TotalFlights,
-                SUM(CASE WHEN DEPARTURE_DELAY > 0 THEN 1 ELSE 0 END) AS DelayedFlights,
-                ROUND(
-                    (SUM(CASE WHEN DEPARTURE_DELAY > 0 THEN 1 ELSE 0 END) * 100.0 / COUNT(*)), 
-                    2
-                ) AS Percentage_Delayed
-            FROM flights
-            GROUP BY ORIGIN_AIRPORT, DESTINATION_AIRPORT
+            SELECT ORIGIN_AIRPORT, DESTINATION_AIRPORT, TotalFlights, DelayedFlights, Percentage_Delayed
+            FROM {flight_stats_by_route}
+            ORDER BY ORIGIN_AIRPORT, DESTINATION_AIRPORT;
+        """,
+        "delayed_by_top_route": """
+            WITH routes AS (
+                SELECT ORIGIN_AIRPORT, DESTINATION_AIRPORT, TotalFlights, DelayedFlights, Percentage_Delayed
+                FROM {flight_stats_by_route}
+            )
+            SELECT ORIGIN_AIRPORT, DESTINATION_AIRPORT, TotalFlights, DelayedFlights, Percentage_Delayed
+            FROM routes
+            WHERE ORIGIN_AIRPORT IN (
+                    SELECT ORIGIN_AIRPORT FROM routes
+                    GROUP BY ORIGIN_AIRPORT
+                    ORDER BY SUM(TotalFlights) DESC, ORIGIN_AIRPORT
+                    LIMIT :top_k
+                )
+                AND DESTINATION_AIRPORT IN (
+                    SELECT DESTINATION_AIRPORT FROM routes
+                    GROUP BY DESTINATION_AIRPORT
+                    ORDER BY SUM(TotalFlights) DESC, DESTINATION_AIRPORT
+                    LIMIT :top_k
+                )
             ORDER BY ORIGIN_AIRPORT, DESTINATION_AIRPORT;
         """,
         "airport_coordinates": """
-            SELECT IATA_CODE, LATITUDE, LONGITUDE FROM airports;
+            SELECT
+                IATA_CODE,
+                LATITUDE,
+                LONGITUDE,
+                LAT,
+                LON,
+                -- A number is digits with at most one decimal point and an optional leading sign
+                LAT_TEXT GLOB '*[0-9]*' AND LAT_TEXT NOT GLOB '*[^0-9.+-]*'
+                    AND substr(LAT_TEXT, 2) NOT GLOB '*[+-]*' AND LAT_TEXT NOT GLOB '*.*.*'
+                    AND LON_TEXT GLOB '*[0-9]*' AND LON_TEXT NOT GLOB '*[^0-9.+-]*'
+                    AND substr(LON_TEXT, 2) NOT GLOB '*[+-]*' AND LON_TEXT NOT GLOB '*.*.*'
+                    AND LAT BETWEEN -90 AND 90
+                    AND LON BETWEEN -180 AND 180 AS VALID
+            FROM (
+                SELECT
+                    IATA_CODE,
+                    LATITUDE,
+                    LONGITUDE,
+                    trim(LATITUDE) AS LAT_TEXT,
+                    trim(LONGITUDE) AS LON_TEXT,
+                    CAST(trim(LATITUDE) AS REAL) AS LAT,
+                    CAST(trim(LONGITUDE) AS REAL) AS LON
+                FROM airports
+            );
         """
     }
 
-    def __init__(self, db_uri: str):
+    def __init__(self, db_uri: str, pool_size: int = 10):
         """
         Initialize the FlightData class with a database URI.
 
         Args:
             db_uri (str): The database connection URI.
+            pool_size (int, optional): Number of connections kept open in the pool. Match it to the
+                number of server threads so concurrent requests don't churn overflow connections.
+                Defaults to 10.
 
         Raises:
             Exception: If the database connection fails.
         """
+        self._cache: Dict[str, Tuple[Optional[float], Any]] = {}
         try:
-            self._engine = create_engine(db_uri, pool_pre_ping=True)
+            is_sqlite = make_url(db_uri).get_backend_name() == "sqlite"
+            engine = create_engine(
+                db_uri,
+                pool_pre_ping=True,
+                pool_use_lifo=True,  # Reuse the most recent connection so its page cache stays warm
+                pool_size=pool_size,
+                max_overflow=20,
+                pool_recycle=1800,
+                query_cache_size=1200,  # Compiled statements kept in the engine-wide LRU cache, shared by all connections
+                connect_args={"check_same_thread": False} if is_sqlite else {},
+            )
+            if is_sqlite:
+                event.listen(engine, "connect", self._apply_sqlite_pragmas)
+            self._engine = engine
             self._test_connection()
+            self._stmts = self._prepare_statements()
+            self._airport_codes, self._airport_coords = self._build_airport_index()
         except Exception as e:
             logging.error(f"Failed to initialize database connection: {e}")
             raise
 
+    def _apply_sqlite_pragmas(self, dbapi_connection, connection_record) -> None:
+        """
+        Apply SQLITE_PRAGMAS to a newly opened SQLite connection.
+
+        Args:
+            dbapi_connection: The raw DBAPI connection.
+            connection_record: The pool record of the connection (unused).
+        """
+        cursor = dbapi_connection.cursor()
+        try:
+            for name, value in self.SQLITE_PRAGMAS.items():
+                cursor.execute(f"PRAGMA {name}={value}")
+        finally:
+            cursor.close()
+
     @contextmanager
     def _get_connection(self):
         """
@@ -152,16 +354,38 @@ class FlightData:
         with self._get_connection() as conn:
             conn.execute(text("SELECT 1"))
 
-    def _execute_query(self, query: str, params: Dict[str, Any] = None) -> List[Dict[str, Any]]:
+    def _prepare_statements(self) -> Dict[str, TextClause]:
+        """
+        Build the statements for QUERIES once, pointing them at the summary tables.
+        Summary tables that have not been built yet are replaced by their query as
+        an inline subquery.
+
+        Returns:
+            Dict[str, TextClause]: The statements keyed by query name.
+        """
+        existing = set(inspect(self._engine).get_table_names())
+        sources = {}
+        for table, query in self.SUMMARIES.items():
+            if table in existing:
+                sources[table] = table
+            else:
+                logging.warning(f"Summary table {table} not found, computing it on the fly. Run migrate.py to build it.")
+                sources[table] = f"({query})"
+        stmts = {name: text(query.format(**sources)) for name, query in self.QUERIES.items()}
+        # Expand the list of IDs into one bound parameter per ID
+        stmts["flights_by_ids"] = stmts["flights_by_ids"].bindparams(bindparam("ids", expanding=True))
+        return stmts
+
+    def _execute_query(self, query: TextClause, params: Dict[str, Any] = None) -> List[Dict[str, Any]]:
         """
         Execute a SQL query with parameters.
 
         Args:
-            query (str): The SQL query to execute.
+            query (TextClause): The prepared SQL statement to execute.
             params (Dict[str, Any], optional): Query parameters. Defaults to None.
 
         Returns:
-            List[Dict[str, Any]]: Query results as a list of dictionaries.
+            List[Dict[str, Any]]: Query results as a list of read-only row mappings.
 
         Raises:
             Exception: If the query execution fails.
@@ -169,14 +393,143 @@ class FlightData:
         params = params or {}
         try:
             with self._get_connection() as connection:
-                result = connection.execute(text(query), params)
-                return [dict(row._mapping) for row in result]
+                return connection.execute(query, params).mappings().all()
         except Exception as e:
             logging.error(f"Query execution error: {e}\nQuery: {query}\nParams: {params}")
             return []
 
+    def _execute_columnar(self, query: TextClause, params: Dict[str, Any] = None) -> Optional[Dict[str, List[Any]]]:
+        """
+        Execute a SQL query and return its results in column-oriented form: the
+        column names once, followed by the bare row values.
+
+        Args:
+            query (TextClause): The prepared SQL statement to execute.
+            params (Dict[str, Any], optional): Query parameters. Defaults to None.
+
+        Returns:
+            Optional[Dict[str, List[Any]]]: The "columns" names and the "rows" as tuples of values,
+            or None if the query failed.
+        """
+        params = params or {}
+        try:
+            with self._get_connection() as connection:
+                result = connection.execute(query, params)
+                columns = list(result.keys())
+                rows = [tuple(row) for row in result]
+        except Exception as e:
+            logging.error(f"Query execution error: {e}\nQuery: {query}\nParams: {params}")
+            return None
+        return {"columns": columns, "rows": rows}
+
+    def _cached(self, key: str, loader: Callable[[], Any], ttl: Optional[float] = None) -> Any:
+        """
+        Return a cached result, loading and storing it on a miss.
+
+        Results that are None or empty are not cached, since they mean the query failed.
+
+        Args:
+            key (str): The cache key.
+            loader (Callable[[], Any]): Computes the result on a cache miss.
+            ttl (Optional[float], optional): Seconds the result stays fresh. Defaults to None (never expires).
+
+        Returns:
+            Any: The cached or freshly loaded result.
+        """
+        entry = self._cache.get(key)
+        if entry and (entry[0] is None or entry[0] > time.monotonic()):
+            return entry[1]
+        value = loader()
+        if value:
+            expires_at = None if ttl is None else time.monotonic() + ttl
+            self._cache[key] = (expires_at, value)
+        return value
+
+    def _stream_query(self, query: TextClause, params: Dict[str, Any] = None) -> Iterator[Dict[str, Any]]:
+        """
+        Execute a SQL query and yield its rows one at a time.
+
+        The connection stays checked out for the lifetime of the generator and is
+        returned to the pool once the generator is exhausted or closed.
+
+        Args:
+            query (TextClause): The prepared SQL statement to execute.
+            params (Dict[str, Any], optional): Query parameters. Defaults to None.
+
+        Yields:
+            Dict[str, Any]: Each result row as a dictionary.
+
+        Raises:
+            Exception: If the query fails, also after some rows were yielded, so that a
+                partial result is never mistaken for a complete one.
+        """
+        params = params or {}
+        try:
+            with self._get_connection() as connection:
+                result = connection.execution_options(
+                    stream_results=True, yield_per=self.STREAM_BATCH_SIZE
+                ).execute(query, params)
+                for row in result:
+                    yield dict(row._mapping)
+        except Exception as e:
+            logging.error(f"Query execution error: {e}\nQuery: {query}\nParams: {params}")
+            raise
+
     # Public Methods
 
+    def rebuild_pages(self) -> None:
+        """
+        Rebuild the SQLite database with PAGE_SIZE pages, unless it already uses them.
+
+        Raises:
+            Exception: If the database cannot be rebuilt.
+        """
+        # VACUUM cannot run inside a transaction
+        with self._engine.connect().execution_options(isolation_level="AUTOCOMMIT") as connection:
+            if connection.exec_driver_sql("PRAGMA page_size").scalar() == self.PAGE_SIZE:
+                return
+            logging.info(f"Rebuilding database with {self.PAGE_SIZE} byte pages")
+            connection.exec_driver_sql(f"PRAGMA page_size={self.PAGE_SIZE}")
+            connection.exec_driver_sql("VACUUM")
+
+    def create_indexes(self) -> None:
+        """
+        Create the indexes in INDEXES if they don't exist yet and refresh the
+        query planner statistics.
+
+        Raises:
+            Exception: If an index cannot be created.
+        """
+        with self._engine.begin() as connection:
+            for name, definition in self.INDEXES.items():
+                logging.info(f"Creating index {name} on {definition}")
+                connection.execute(text(f"CREATE INDEX IF NOT EXISTS {name} ON {definition}"))
+            connection.execute(text("ANALYZE"))
+
+    def refresh_summaries(self) -> None:
+        """
+        Rebuild the summary tables in SUMMARIES from the flights table.
+
+        Raises:
+            Exception: If a summary table cannot be rebuilt.
+        """
+        with self._engine.begin() as connection:
+            for table, query in self.SUMMARIES.items():
+                logging.info(f"Rebuilding summary table {table}")
+                connection.execute(text(f"DROP TABLE IF EXISTS {table}"))
+                connection.execute(text(f"CREATE TABLE {table} AS {query}"))
+        self.reload()
+
+    def reload(self) -> None:
+        """
+        Drop everything loaded from the database so it is read again on next use: the
+        cached results, the airport index and which summary tables exist. Call it after
+        the database was changed, e.g. re-ingested or migrated by another process.
+        """
+        self._cache.clear()
+        self._stmts = self._prepare_statements()
+        self._airport_codes, self._airport_coords = self._build_airport_index()
+
     def get_flight_by_id(self, flight_id: int) -> Optional[Dict[str, Any]]:
         """
         Retrieve flight information by ID.
@@ -187,9 +540,21 @@ class FlightData:
         Returns:
             Optional[Dict[str, Any]]: Flight details as a dictionary, or None if not found.
         """
-        results = self._execute_query(self.QUERIES["flight_by_id"], {"id": flight_id})
+        results = self._execute_query(self._stmts["flight_by_id"], {"id": flight_id})
         return results[0] if results else None
 
+    def iter_flights_by_ids(self, flight_ids: List[int]) -> Iterator[Dict[str, Any]]:
+        """
+        Stream several flights by ID from a single query.
+
+        Args:
+            flight_ids (List[int]): The IDs of the flights to retrieve.
+
+        Returns:
+            Iterator[Dict[str, Any]]: The details of the flights found, ordered by ID, one at a time.
+        """
+        return self._stream_query(self._stmts["flights_by_ids"], {"ids": flight_ids})
+
     def get_delayed_flights_by_airline(self, airline: str) -> List[Dict[str, Any]]:
         """
         Get delayed flights for a specific airline.
@@ -200,7 +565,7 @@ class FlightData:
         Returns:
             List[Dict[str, Any]]: A list of delayed flights as dictionaries.
         """
-        return self._execute_query(self.QUERIES["delayed_flights_by_airline"], {"airline": airline})
+        return self._execute_query(self._stmts["delayed_flights_by_airline"], {"airline": airline})
 
     def get_delayed_flights_by_airport(self, airport: str) -> List[Dict[str, Any]]:
         """
@@ -212,7 +577,7 @@ class FlightData:
         Returns:
             List[Dict[str, Any]]: A list of delayed flights as dictionaries.
         """
-        return self._execute_query(self.QUERIES["delayed_flights_by_airport"], {"airport": airport})
+        return self._execute_query(self._stmts["delayed_flights_by_airport"], {"airport": airport})
 
     def get_flights_by_date(self, day: int, month: int, year: int) -> List[Dict[str, Any]]:
         """
@@ -226,56 +591,160 @@ class FlightData:
         Returns:
             List[Dict[str, Any]]: A list of flights as dictionaries.
         """
-        return self._execute_query(self.QUERIES["flights_by_date"], {"day": day, "month": month, "year": year})
+        return self._execute_query(self._stmts["flights_by_date"], {"day": day, "month": month, "year": year})
+
+    def iter_delayed_flights_by_airline(self, airline: str) -> Iterator[Dict[str, Any]]:
+        """
+        Stream delayed flights for a specific airline.
+
+        Args:
+            airline (str): The name of the airline.
+
+        Returns:
+            Iterator[Dict[str, Any]]: Delayed flights as dictionaries, one at a time.
+        """
+        return self._stream_query(self._stmts["delayed_flights_by_airline"], {"airline": airline})
+
+    def iter_delayed_flights_by_airport(self, airport: str) -> Iterator[Dict[str, Any]]:
+        """
+        Stream delayed flights for a specific origin airport.
+
+        Args:
+            airport (str): The IATA code of the origin airport.
+
+        Returns:
+            Iterator[Dict[str, Any]]: Delayed flights as dictionaries, one at a time.
+        """
+        return self._stream_query(self._stmts["delayed_flights_by_airport"], {"airport": airport})
 
-    def get_delayed_flights_percentage_by_airline(self) -> List[Dict[str, Any]]:
+    def iter_flights_by_date(self, day: int, month: int, year: int) -> Iterator[Dict[str, Any]]:
+        """
+        Stream all flights for a specific date.
+
+        Args:
+            day (int): The day of the flight.
+            month (int): The month of the flight.
+            year (int): The year of the flight.
+
+        Returns:
+            Iterator[Dict[str, Any]]: Flights as dictionaries, one at a time.
+        """
+        return self._stream_query(self._stmts["flights_by_date"], {"day": day, "month": month, "year": year})
+
+    def get_delayed_flights_percentage_by_airline(self) -> Optional[Dict[str, List[Any]]]:
         """
         Get the percentage of delayed flights by airline.
 
         Returns:
-            List[Dict[str, Any]]: A list of airline delay percentages as dictionaries.
+            Optional[Dict[str, List[Any]]]: The column names and rows of the airline delay percentages,
+            or None if the query failed.
         """
-        return self._execute_query(self.QUERIES["delayed_by_airline"])
+        return self._cached(
+            "delayed_by_airline", lambda: self._execute_columnar(self._stmts["delayed_by_airline"]), self.CACHE_TTL
+        )
 
-    def get_delayed_flights_percentage_by_hour(self) -> List[Dict[str, Any]]:
+    def get_delayed_flights_percentage_by_hour(self) -> Optional[Dict[str, List[Any]]]:
         """
         Get the percentage of delayed flights by hour interval.
 
         Returns:
-            List[Dict[str, Any]]: A list of hourly delay percentages as dictionaries.
+            Optional[Dict[str, List[Any]]]: The column names and rows of the hourly delay percentages,
+            or None if the query failed.
         """
-        return self._execute_query(self.QUERIES["delayed_by_hour"])
+        return self._cached(
+            "delayed_by_hour", lambda: self._execute_columnar(self._stmts["delayed_by_hour"]), self.CACHE_TTL
+        )
 
-    def get_delayed_flights_percentage_by_route(self) -> List[Dict[str, Any]]:
+    def get_delayed_flights_percentage_by_route(self) -> Optional[Dict[str, List[Any]]]:
         """
         Get the percentage of delayed flights by route.
 
         Returns:
-            List[Dict[str, Any]]: A list of route delay percentages as dictionaries.
+            Optional[Dict[str, List[Any]]]: The column names and rows of the route delay percentages,
+            or None if the query failed.
+        """
+        return self._cached(
+            "delayed_by_route", lambda: self._execute_columnar(self._stmts["delayed_by_route"]), self.CACHE_TTL
+        )
+
+    def get_delayed_flights_percentage_by_top_routes(self, top_k: int = 50) -> Optional[Dict[str, List[Any]]]:
+        """
+        Get the percentage of delayed flights by route, limited to routes between the
+        busiest origin and destination airports.
+
+        Args:
+            top_k (int): The number of origin and of destination airports to keep, by flight count.
+
+        Returns:
+            Optional[Dict[str, List[Any]]]: The column names and rows of the route delay percentages,
+            or None if the query failed.
         """
-        return self._execute_query(self.QUERIES["delayed_by_route"])
+        return self._cached(
+            f"delayed_by_top_route:{top_k}",
+            lambda: self._execute_columnar(self._stmts["delayed_by_top_route"], {"top_k": top_k}),
+            self.CACHE_TTL
+        )
 
     def get_airport_coordinates(self) -> List[Dict[str, Any]]:
         """
         Fetch airport coordinates with validation.
 
+        The airports table is a static lookup table, so the result is cached for the
+        lifetime of the instance.
+
         Returns:
             List[Dict[str, Any]]: A list of valid airport coordinates as dictionaries.
         """
-        results = self._execute_query(self.QUERIES["airport_coordinates"])
+        return self._cached("airport_coordinates", self._load_airport_coordinates)
+
+    def lookup_coordinates(self, iatas: Sequence[str]) -> np.ndarray:
+        """
+        Look up the coordinates of many airports at once.
+
+        Args:
+            iatas (Sequence[str]): The IATA codes of the airports.
+
+        Returns:
+            np.ndarray: An (N, 2) array of latitude and longitude, NaN for unknown airports.
+        """
+        iatas = np.asarray(iatas, dtype=str)
+        coords = np.full((iatas.size, 2), np.nan)
+        if self._airport_codes.size:
+            pos = np.searchsorted(self._airport_codes, iatas).clip(max=self._airport_codes.size - 1)
+            found = self._airport_codes[pos] == iatas
+            coords[found] = self._airport_coords[pos[found]]
+        return coords
+
+    def _build_airport_index(self) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Load the airport coordinates into contiguous arrays sorted by IATA code,
+        for binary-search lookups.
 
+        Returns:
+            Tuple[np.ndarray, np.ndarray]: The sorted IATA codes and their (latitude, longitude) rows.
+        """
+        airports = self.get_airport_coordinates()
+        codes = np.array([airport["IATA"] for airport in airports], dtype=str)
+        coords = np.array(
+            [(airport["Latitude"], airport["Longitude"]) for airport in airports], dtype=np.float64
+        ).reshape(-1, 2)
+        order = np.argsort(codes)
+        return codes[order], coords[order]
+
+    def _load_airport_coordinates(self) -> List[Dict[str, Any]]:
+        """
+        Query the coordinates of all airports. The query flags the rows whose
+        coordinates are not valid numbers within range; these are logged and skipped.
+
+        Returns:
+            List[Dict[str, Any]]: A list of valid airport coordinates as dictionaries.
+        """
         valid_airports = []
-        for row in results:
-            try:
-                latitude = float(row["LATITUDE"])
-                longitude = float(row["LONGITUDE"])
-                valid_airports.append({
-                    "IATA": row["IATA_CODE"],
-                    "Latitude": latitude,
-                    "Longitude": longitude
-                })
-            except ValueError:
+        for row in self._execute_query(self._stmts["airport_coordinates"]):
+            if row["VALID"]:
+                valid_airports.append({"IATA": row["IATA_CODE"], "Latitude": row["LAT"], "Longitude": row["LON"]})
+            else:
                 logging.warning(
                     f"Invalid coordinates for airport {row['IATA_CODE']}: LATITUDE={row['LATITUDE']}, LONGITUDE={row['LONGITUDE']}"
                 )
-        return valid_airports
\ No newline at end of file
+        return valid_airports
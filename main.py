@@ -1,15 +1,26 @@
+import os
+import matplotlib
+
+# Open plot windows in addition to saving them if SKYSQL_SHOW is 1, true or yes
+SHOW_PLOTS = os.environ.get('SKYSQL_SHOW', '').strip().lower() in ('1', 'true', 'yes')
+if not SHOW_PLOTS:
+    matplotlib.use('Agg')  # Render off-screen; must be selected before pyplot is imported
+
 import seaborn as sns
 import matplotlib.pyplot as plt
+from matplotlib.collections import LineCollection
+from matplotlib.figure import Figure
 import pandas as pd
 from datetime import datetime
 import logging
+import re
 from typing import Callable, Dict, List, Any, Tuple
 from dataclasses import dataclass
 import sys
 from pathlib import Path
 import geopandas as gpd
-from shapely.geometry import LineString
-import os
+import numpy as np
+from pyproj import Transformer
 
 
 
@@ -25,7 +36,13 @@ logging.basicConfig(
 
 SQLITE_URI = 'sqlite:///data/flights.sqlite3'
 IATA_LENGTH = 3
+_IATA_RE = re.compile(r'[A-Za-z]{%d}' % IATA_LENGTH)
+_DATE_RE = re.compile(r'[0-9]{1,2}/[0-9]{1,2}/[0-9]{4}')  # DD/MM/YYYY shape, checked before parsing
 PLOT_OUTPUT_DIR = Path('plots')
+MAP_BOUNDS = (-160, 15, -50, 50)  # Geographic map extent: min lon, min lat, max lon, max lat
+MAP_CRS = 5070  # Planar CRS the map is drawn in (EPSG:5070, CONUS Albers equal-area)
+MAP_DPI = 150  # Preview resolution for the large geographic map
+DELAY_BIN_EDGES = np.array([25, 50, 75])  # Upper bounds (inclusive) of the delay percentage ranges
 
 
 @dataclass
@@ -38,6 +55,12 @@ class PlotConfig:
     rotation: int
     palette: str
     output_file: str
+    dpi: int = 300
+
+
+def bin_delay_percentages(percentages: np.ndarray) -> np.ndarray:
+    """Map delay percentages to delay range codes 0-3 (<= 25%, <= 50%, <= 75%, above)."""
+    return np.searchsorted(DELAY_BIN_EDGES, np.asarray(percentages, dtype=np.float64), side='left').astype(np.int8)
 
 
 class InputValidator:
@@ -60,11 +83,13 @@ class InputValidator:
     @staticmethod
     def validate_iata(code: str) -> bool:
         """Validate IATA airport code."""
-        return code.isalpha() and len(code) == IATA_LENGTH
+        return _IATA_RE.fullmatch(code) is not None
 
     @staticmethod
     def validate_date(date_str: str) -> bool:
         """Validate date string."""
+        if not _DATE_RE.fullmatch(date_str):
+            return False
         try:
             datetime.strptime(date_str, '%d/%m/%Y')
             return True
@@ -88,6 +113,30 @@ class FlightDataVisualizer:
         """Initialize visualizer and create output directory."""
         PLOT_OUTPUT_DIR.mkdir(exist_ok=True)
         self.set_plot_style()
+        self._world = None
+        self._fig_cache: Dict[str, Figure] = {}
+
+    def get_figure(self, name: str, figsize: Tuple[int, int]) -> Figure:
+        """Return the figure kept for a plot, cleared for redrawing, creating it on first use."""
+        fig = self._fig_cache.get(name)
+        if fig is not None and plt.fignum_exists(fig.number):
+            fig.clf()
+            plt.figure(fig.number)  # Make it the current figure again
+        else:
+            fig = plt.figure(figsize=figsize, layout='constrained')
+            self._fig_cache[name] = fig
+        return fig
+
+    def load_world(self, shapefile_path: str) -> gpd.GeoDataFrame:
+        """Load the countries within the map extent from a shapefile, projected to MAP_CRS and reused on later calls."""
+        if self._world is None:
+            # Read through GDAL's Arrow API, skipping the attribute columns and any country
+            # outside the map extent
+            self._world = gpd.read_file(
+                shapefile_path, engine='pyogrio', use_arrow=True, columns=[], bbox=MAP_BOUNDS
+            ).to_crs(MAP_CRS)
+            logging.info(f"Successfully loaded shapefile from {shapefile_path}")
+        return self._world
 
     @staticmethod
     def set_plot_style():
@@ -101,24 +150,25 @@ class FlightDataVisualizer:
     def create_plot(self, df: pd.DataFrame, config: PlotConfig) -> None:
         """Create and save a plot with given configuration."""
         try:
-            plt.figure(figsize=config.figsize)
+            ax = self.get_figure(config.output_file, config.figsize).subplots()
 
-            if 'Interval' in df.columns:
-                sns.barplot(x="Interval", y="Percentage_Delayed", data=df, palette=config.palette)
-            else:
-                sns.barplot(x="Airline", y="Percentage_Delayed", data=df, palette=config.palette)
+            # Draw the bars directly, with one palette color per bar at seaborn's bar saturation
+            x = "Interval" if 'Interval' in df.columns else "Airline"
+            colors = sns.color_palette(config.palette, len(df), desat=0.75)
+            ax.bar(df[x].astype(str), df["Percentage_Delayed"], color=colors)
+            ax.set_xlim(-0.5, len(df) - 0.5)
+            ax.grid(False, axis='x')
 
             plt.title(config.title, pad=20)
             plt.xlabel(config.xlabel)
             plt.ylabel(config.ylabel)
             plt.xticks(rotation=config.rotation, ha='right')
-            plt.tight_layout()
 
             output_path = PLOT_OUTPUT_DIR / config.output_file
-            plt.savefig(output_path, dpi=300, bbox_inches='tight')
+            plt.savefig(output_path, dpi=config.dpi, bbox_inches='tight')
             logging.info(f"Plot saved to {output_path}")
-            plt.show()
-            plt.close()
+            if SHOW_PLOTS:
+                plt.show()
         except Exception as e:
             logging.error(f"Error creating plot: {e}")
             print("Failed to create plot. Check the log file for details.")
@@ -126,28 +176,29 @@ class FlightDataVisualizer:
     def create_heatmap(self, df: pd.DataFrame, config: PlotConfig) -> None:
         """Create and save a heatmap with given configuration."""
         try:
-            plt.figure(figsize=config.figsize)
+            ax = self.get_figure(config.output_file, config.figsize).subplots()
 
             sns.heatmap(
                 df,
+                ax=ax,
                 annot=False,  # Disable cell annotations (no numbers)
                 cmap="Reds",  # Use only the red color spectrum
                 cbar_kws={"label": "Percentage Delayed (%)"},  # Color bar label
                 linewidths=0.5,  # Add grid lines for better readability
-                linecolor='white'  # Set grid line color to white
+                linecolor='white',  # Set grid line color to white
+                rasterized=True  # Draw the cell mesh as a single image
             )
 
             plt.title(config.title, pad=20)
             plt.xlabel(config.xlabel)
             plt.ylabel(config.ylabel)
             plt.xticks(rotation=config.rotation, ha='right')
-            plt.tight_layout()
 
             output_path = PLOT_OUTPUT_DIR / config.output_file
-            plt.savefig(output_path, dpi=300, bbox_inches='tight')
+            plt.savefig(output_path, dpi=config.dpi, bbox_inches='tight')
             logging.info(f"Heatmap saved to {output_path}")
-            plt.show()
-            plt.close()
+            if SHOW_PLOTS:
+                plt.show()
         except Exception as e:
             logging.error(f"Error creating heatmap: {e}")
             print("Failed to create heatmap. Check the log file for details.")
@@ -161,6 +212,27 @@ class FlightAnalyzer:
         self.data_manager = data_manager
         self.visualizer = FlightDataVisualizer()
         self.validator = InputValidator()
+        self._cache: Dict[str, Any] = {}
+
+    def _cached(self, method_name: str) -> Any:
+        """Return the result of a data manager method, querying it only once per session unless it failed."""
+        if method_name in self._cache:
+            return self._cache[method_name]
+        result = getattr(self.data_manager, method_name)()
+        if result is not None:
+            self._cache[method_name] = result
+        return result
+
+    @staticmethod
+    def _to_frame(results: Dict[str, List[Any]]) -> pd.DataFrame:
+        """Build a DataFrame from columnar query results, one column array at a time."""
+        return pd.DataFrame(dict(zip(results["columns"], map(np.asarray, zip(*results["rows"])))))
+
+    def clear_cache(self) -> None:
+        """Drop the cached query results so the next plot reads fresh data."""
+        self._cache.clear()
+        self.data_manager.reload()
+        print("Cached results cleared.")
 
     def print_results(self, results: List[Dict[str, Any]]) -> None:
         """Print flight results in a formatted manner."""
@@ -169,17 +241,16 @@ class FlightAnalyzer:
             return
 
         print(f"Found {len(results)} results:")
-        for result in results:
-            try:
-                delay = int(result.get('DEPARTURE_DELAY', 0) or 0)
-                flight_info = (f"{result['ID']}. {result['ORIGIN_AIRPORT']} -> "
-                               f"{result['DESTINATION_AIRPORT']} by {result['AIRLINE']}")
-                if delay > 0:
-                    flight_info += f", Delay: {delay} Minutes"
-                print(flight_info)
-            except (ValueError, KeyError) as e:
-                logging.error(f"Error formatting result: {e}")
-                continue
+        try:
+            # Format every row in vectorized string operations and write them out at once
+            df = pd.DataFrame(list(results))
+            delay = df['DEPARTURE_DELAY']
+            lines = (df['ID'].astype(str) + ". " + df['ORIGIN_AIRPORT'].astype(str) + " -> "
+                     + df['DESTINATION_AIRPORT'].astype(str) + " by " + df['AIRLINE'].astype(str))
+            lines += np.where(delay > 0, ", Delay: " + delay.astype(str) + " Minutes", "")
+            sys.stdout.write("\n".join(lines) + "\n")
+        except (ValueError, KeyError) as e:
+            logging.error(f"Error formatting results: {e}")
 
     def delayed_flights_by_airline(self) -> None:
         """Handle delayed flights by airline query."""
@@ -223,12 +294,12 @@ class FlightAnalyzer:
 
     def plot_delayed_flights_by_airline(self) -> None:
         """Create plot of delayed flights by airline."""
-        results = self.data_manager.get_delayed_flights_percentage_by_airline()
-        if not results:
+        results = self._cached("get_delayed_flights_percentage_by_airline")
+        if not results or not results["rows"]:
             print("No data available for plotting.")
             return
 
-        df = pd.DataFrame(results).sort_values(by="Percentage_Delayed", ascending=True)
+        df = self._to_frame(results)
         config = PlotConfig(
             figsize=(12, 6),
             title="Percentage of Delayed Flights by Airline",
@@ -242,12 +313,12 @@ class FlightAnalyzer:
 
     def plot_delayed_flights_by_hour(self) -> None:
         """Create plot of delayed flights by hour."""
-        results = self.data_manager.get_delayed_flights_percentage_by_hour()
-        if not results:
+        results = self._cached("get_delayed_flights_percentage_by_hour")
+        if not results or not results["rows"]:
             print("No data available for plotting.")
             return
 
-        df = pd.DataFrame(results)
+        df = self._to_frame(results)
         df.rename(columns={"ScheduledHour": "Interval", "Percentage_Delayed": "Percentage_Delayed"}, inplace=True)
 
         config = PlotConfig(
@@ -263,18 +334,18 @@ class FlightAnalyzer:
 
     def plot_delayed_flights_by_route(self) -> None:
         """Create heatmap of delayed flights by origin-destination pair."""
-        results = self.data_manager.get_delayed_flights_percentage_by_route()
-        if not results:
+        results = self._cached("get_delayed_flights_percentage_by_top_routes")
+        if not results or not results["rows"]:
             print("No data available for plotting.")
             return
 
-        df = pd.DataFrame(results)
+        df = self._to_frame(results)
         pivot_df = df.pivot(index="ORIGIN_AIRPORT", columns="DESTINATION_AIRPORT", values="Percentage_Delayed")
         pivot_df = pivot_df.fillna(0)
 
         config = PlotConfig(
             figsize=(16, 12),
-            title="Percentage of Delayed Flights by Route",
+            title="Percentage of Delayed Flights by Route (Busiest Airports)",
             xlabel="Destination Airport",
             ylabel="Origin Airport",
             rotation=45,
@@ -287,48 +358,35 @@ class FlightAnalyzer:
         """Create a geographic map showing delayed flights per route with colored lines."""
         try:
             # Fetch delayed flights percentage by route
-            results = self.data_manager.get_delayed_flights_percentage_by_route()
-            if not results:
+            results = self._cached("get_delayed_flights_percentage_by_route")
+            if not results or not results["rows"]:
                 print("No data available for plotting.")
                 return
 
             # Convert results to DataFrame
-            df = pd.DataFrame(results)
-
-            # Merge with airport coordinates
-            airports = self.data_manager.get_airport_coordinates()
-            airports_df = pd.DataFrame(airports)
-
-            # Merge origin and destination airports with their coordinates
-            df = pd.merge(df, airports_df, left_on="ORIGIN_AIRPORT", right_on="IATA", how="left")
-            df.rename(columns={"Latitude": "Origin_Lat", "Longitude": "Origin_Lon"}, inplace=True)
-            df = pd.merge(df, airports_df, left_on="DESTINATION_AIRPORT", right_on="IATA", how="left")
-            df.rename(columns={"Latitude": "Dest_Lat", "Longitude": "Dest_Lon"}, inplace=True)
-
-            # Drop rows with missing coordinates
-            df = df.dropna(subset=["Origin_Lat", "Origin_Lon", "Dest_Lat", "Dest_Lon"])
-
-            # Create geometry for lines
-            df['geometry'] = df.apply(
-                lambda row: LineString([(row['Origin_Lon'], row['Origin_Lat']), (row['Dest_Lon'], row['Dest_Lat'])]),
-                axis=1
-            )
-
-            # Convert to GeoDataFrame
-            gdf = gpd.GeoDataFrame(df, geometry='geometry')
-
-            # Define color mapping for delay percentages
-            def get_color(delay_percent):
-                if delay_percent <= 25:
-                    return '#FFCCCB'  # Very light pink for low delays
-                elif delay_percent <= 50:
-                    return '#FF6347'  # Tomato for medium-low delays
-                elif delay_percent <= 75:
-                    return '#DC143C'  # Crimson for medium-high delays
-                else:
-                    return '#8B0000'  # Dark red for high delays
-
-            gdf['color'] = gdf['Percentage_Delayed'].apply(get_color)
+            df = self._to_frame(results)
+
+            # Look up origin and destination coordinates in the airport index built at startup
+            origin_coords = self.data_manager.lookup_coordinates(df["ORIGIN_AIRPORT"].to_numpy())
+            dest_coords = self.data_manager.lookup_coordinates(df["DESTINATION_AIRPORT"].to_numpy())
+
+            # Drop rows whose airports have no coordinates
+            found = ~(np.isnan(origin_coords).any(axis=1) | np.isnan(dest_coords).any(axis=1))
+            df = df[found].copy()
+            df[["Origin_Lat", "Origin_Lon"]] = origin_coords[found]
+            df[["Dest_Lat", "Dest_Lon"]] = dest_coords[found]
+
+            # Project the route end points to the map CRS as plain coordinate arrays, without
+            # building line geometries
+            to_map = Transformer.from_crs(4326, MAP_CRS, always_xy=True)
+            df['Origin_X'], df['Origin_Y'] = to_map.transform(df['Origin_Lon'].to_numpy(), df['Origin_Lat'].to_numpy())
+            df['Dest_X'], df['Dest_Y'] = to_map.transform(df['Dest_Lon'].to_numpy(), df['Dest_Lat'].to_numpy())
+
+            # Assign each route its delay range in one vectorized pass: very light pink (<= 25%),
+            # tomato (<= 50%), crimson (<= 75%) and dark red (above)
+            delay_palette = np.array(['#FFCCCB', '#FF6347', '#DC143C', '#8B0000'])
+            df['delay_bin'] = bin_delay_percentages(df['Percentage_Delayed'].to_numpy())
+            df['color'] = delay_palette[df['delay_bin'].to_numpy()]
 
             # --- Updated: Use the exact file path provided ---
             shapefile_path = "data/naturalearth_lowres/ne_10m_admin_0_countries.shp"
@@ -339,56 +397,58 @@ class FlightAnalyzer:
                 print(f"Could not find shapefile at {shapefile_path}")
                 return
 
-            # Load the shapefile
+            # Load the shapefile, or reuse it if it was loaded before
             try:
-                world = gpd.read_file(shapefile_path)
-                logging.info(f"Successfully loaded shapefile from {shapefile_path}")
+                world = self.visualizer.load_world(shapefile_path)
             except Exception as e:
                 logging.error(f"Error loading shapefile: {e}")
                 print(f"Error loading shapefile: {e}")
                 return
 
-    # Define delay ranges
-            delay_ranges = [(0, 25), (26, 50), (51, 75), (76, 100)]
-            colors = ['#FFCCCB', '#FF6347', '#DC143C', '#8B0000']
+            # Project the map extent, following its curved edges, for the subplot limits
+            min_x, min_y, max_x, max_y = to_map.transform_bounds(*MAP_BOUNDS, densify_pts=21)
+
+            # Define delay range titles and split the routes by range in a single grouping pass
             titles = ['0-25% Delay', '26-50% Delay', '51-75% Delay', '76-100% Delay']
+            routes_by_bin = dict(list(df.groupby('delay_bin', sort=True)))
 
-            # Create a figure with subplots
-            fig, axs = plt.subplots(4, 1, figsize=(20, 20))
+            # Create a figure with subplots, reusing the one from a previous run
+            output_path = PLOT_OUTPUT_DIR / "delayed_flights_by_delay_range.png"
+            axs = self.visualizer.get_figure(output_path.name, (20, 20)).subplots(4, 1)
             axs = axs.ravel()  # Flatten the array for easier indexing
 
-            for i, (min_delay, max_delay) in enumerate(delay_ranges):
-                # Filter the data for this delay range
-                filtered_gdf = gdf[(gdf['Percentage_Delayed'] > min_delay) & (gdf['Percentage_Delayed'] <= max_delay)]
+            for i, title in enumerate(titles):
+                # Take the routes of this delay range, keeping an empty subplot if there are none
+                routes = routes_by_bin.get(i, df.iloc[:0])
                 
-                # Plot the map
-                world.plot(ax=axs[i], color='lightgrey', edgecolor='black')
-
-                # Plot routes
-                for _, row in filtered_gdf.iterrows():
-                    axs[i].plot(
-                        [row['geometry'].coords[0][0], row['geometry'].coords[1][0]],
-                        [row['geometry'].coords[0][1], row['geometry'].coords[1][1]],
-                        color=colors[i],
-                        linewidth=1.5,
-                        alpha=0.8
-                    )
+                # Plot the map, rasterizing it and anything drawn beneath it in vector outputs
+                axs[i].set_rasterization_zorder(1)
+                world.plot(ax=axs[i], color='lightgrey', edgecolor='black', rasterized=True)
+
+                # Plot all routes of this range as a single collection of projected line segments
+                segments = np.stack([
+                    routes[['Origin_X', 'Origin_Y']].to_numpy(),
+                    routes[['Dest_X', 'Dest_Y']].to_numpy()
+                ], axis=1)
+                axs[i].add_collection(LineCollection(
+                    segments,
+                    colors=delay_palette[i],
+                    linewidths=1.5,
+                    alpha=0.8,
+                    rasterized=True
+                ))
 
                 # Configure each subplot
-                axs[i].set_title(titles[i], fontsize=14)
-                axs[i].set_xlim(xmin=-160, xmax=-50)
-                axs[i].set_ylim(ymin=15, ymax=50)
-                axs[i].set_aspect('equal')
-
-            # Adjust layout to prevent overlapping
-            plt.tight_layout()
+                axs[i].set_title(title, fontsize=14)
+                axs[i].set_xlim(xmin=min_x, xmax=max_x)
+                axs[i].set_ylim(ymin=min_y, ymax=max_y)
+                axs[i].set_axis_off()  # Projected coordinates are meters, not useful as tick labels
 
             # Save and display the plot
-            output_path = PLOT_OUTPUT_DIR / "delayed_flights_by_delay_range.png"
-            plt.savefig(output_path, dpi=300, bbox_inches='tight')
+            plt.savefig(output_path, dpi=MAP_DPI, bbox_inches='tight')
             logging.info(f"Maps saved to {output_path}")
-            plt.show()
-            plt.close()
+            if SHOW_PLOTS:
+                plt.show()
 
 
 
@@ -408,7 +468,8 @@ def create_menu() -> Dict[int, Tuple[Callable, str]]:
         6: (FlightAnalyzer.plot_delayed_flights_by_hour, "Plot delayed flights by hour"),
         7: (FlightAnalyzer.plot_delayed_flights_by_route, "Plot delayed flights by route (heatmap)"),
         8: (FlightAnalyzer.plot_delayed_flights_by_route_map, "Plot delayed flights by route (geographic map)"),
-        9: (sys.exit, "Exit")
+        9: (FlightAnalyzer.clear_cache, "Clear cached results"),
+        10: (sys.exit, "Exit")
     }
 
 
@@ -425,12 +486,12 @@ def main():
                 print(f"{key}. {description}")
 
             choice = InputValidator.get_valid_input(
-                "\nEnter your choice (1-9): ",
-                lambda x: x.isdigit() and 1 <= int(x) <= 9,
-                "Invalid choice. Please enter a number between 1 and 9."
+                "\nEnter your choice (1-10): ",
+                lambda x: x.isdigit() and 1 <= int(x) <= 10,
+                "Invalid choice. Please enter a number between 1 and 10."
             )
 
-            if int(choice) == 9:
+            if int(choice) == 10:
                 print("Goodbye!")
                 sys.exit(0)
             menu[int(choice)][0](analyzer)
@@ -0,0 +1,26 @@
+"""
+One-time migration that prepares the flight database for the API queries.
+
+Usage:
+    python migrate.py [database URI]
+"""
+import logging
+import sys
+
+from data import FlightData
+
+SQLITE_URI = 'sqlite:///data/flights.sqlite3'
+
+
+def main():
+    """Run the migration against the given database, or the bundled one by default."""
+    db_uri = sys.argv[1] if len(sys.argv) > 1 else SQLITE_URI
+    flight_data = FlightData(db_uri)
+    flight_data.rebuild_pages()
+    flight_data.create_indexes()
+    flight_data.refresh_summaries()
+    logging.info(f"Migration of {db_uri} complete")
+
+
+if __name__ == "__main__":
+    main()